@@ -115,7 +115,7 @@ class Discover:
 
         device_class = Discover._get_device_class(info)
         if device_class is not None:
-            return device_class(host)
+            return device_class(host, protocol=protocol)
 
         return None
 
@@ -1,11 +1,16 @@
+import asyncio
 import json
 import socket
 import struct
+import threading
+import time
 import logging
-from typing import Any, Dict, Union
+from typing import Any, Dict, Optional, Tuple, Union
 
 _LOGGER = logging.getLogger(__name__)
 
+_Connection = Tuple[socket.socket, float]
+
 
 class TPLinkSmartHomeProtocol:
     """Implementation of the TP-Link Smart Home Protocol.
@@ -23,11 +28,20 @@ class TPLinkSmartHomeProtocol:
     INITIALIZATION_VECTOR = 171
     DEFAULT_PORT = 9999
     DEFAULT_TIMEOUT = 5
+    IDLE_TIMEOUT = 10
+
+    # open connection and time of its last use for each (host, port),
+    # shared by all callers so that devices on one host share a connection
+    _connections = {}  # type: Dict[Tuple[str, int], _Connection]
+    _lock = threading.Lock()
 
     @staticmethod
     def query(host: str, request: Union[str, Dict], port: int = DEFAULT_PORT) -> Any:
         """Request information from a TP-Link SmartHome Device.
 
+        The connection to the device is kept open and reused for subsequent
+        queries, unless it has been idle for more than IDLE_TIMEOUT seconds.
+
         :param str host: host name or ip address of the device
         :param int port: port on the device (default: 9999)
         :param request: command to send to the device (can be either dict or
@@ -37,40 +51,196 @@ class TPLinkSmartHomeProtocol:
         if isinstance(request, dict):
             request = json.dumps(request)
 
-        timeout = TPLinkSmartHomeProtocol.DEFAULT_TIMEOUT
-        sock = None
+        key = (host, port)
+        with TPLinkSmartHomeProtocol._lock:
+            TPLinkSmartHomeProtocol._close_idle_connections()
+            sock = TPLinkSmartHomeProtocol._connections.pop(key, (None, 0.0))[0]
+
+        reused = sock is not None
+        while True:
+            if sock is None:
+                sock = socket.create_connection(
+                    (host, port), TPLinkSmartHomeProtocol.DEFAULT_TIMEOUT
+                )
+            try:
+                buffer, keep_open = TPLinkSmartHomeProtocol._exchange(sock, request)
+                break
+            except Exception:
+                TPLinkSmartHomeProtocol._close_socket(sock)
+                sock = None
+                if not reused:
+                    raise
+                # The device may have closed the connection in the
+                # meanwhile, so retry once using a new one.
+                _LOGGER.debug("Reconnecting to %s:%s", host, port)
+                reused = False
+
+        if keep_open:
+            with TPLinkSmartHomeProtocol._lock:
+                # a concurrent query may have stored its own connection
+                previous = TPLinkSmartHomeProtocol._connections.get(key)
+                TPLinkSmartHomeProtocol._connections[key] = (sock, time.monotonic())
+            if previous is not None:
+                TPLinkSmartHomeProtocol._close_socket(previous[0])
+        else:
+            TPLinkSmartHomeProtocol._close_socket(sock)
+
+        response = TPLinkSmartHomeProtocol.decrypt(buffer[4:])
+        _LOGGER.debug("< (%i) %s", len(response), response)
+
+        return json.loads(response)
+
+    @staticmethod
+    def close(host: Optional[str] = None, port: int = DEFAULT_PORT) -> None:
+        """Close the connections kept open to the devices.
+
+        :param str host: only close the connection to this host
+        (default: close all connections)
+        :param int port: port on the device (default: 9999)
+        """
+        with TPLinkSmartHomeProtocol._lock:
+            connections = TPLinkSmartHomeProtocol._connections
+            if host is None:
+                closed = list(connections.values())
+                connections.clear()
+            elif (host, port) in connections:
+                closed = [connections.pop((host, port))]
+            else:
+                closed = []
+
+        for sock, _ in closed:
+            TPLinkSmartHomeProtocol._close_socket(sock)
+
+    @staticmethod
+    def _close_idle_connections() -> None:
+        """Close the connections unused for more than IDLE_TIMEOUT seconds.
+
+        Has to be called with the lock held.
+        """
+        now = time.monotonic()
+        connections = TPLinkSmartHomeProtocol._connections
+        for key, (sock, last_used) in list(connections.items()):
+            if now - last_used > TPLinkSmartHomeProtocol.IDLE_TIMEOUT:
+                _LOGGER.debug("Closing idle connection to %s:%s", *key)
+                del connections[key]
+                TPLinkSmartHomeProtocol._close_socket(sock)
+
+    @staticmethod
+    def _exchange(sock: socket.socket, request: str) -> Tuple[bytes, bool]:
+        """Send a request and read the response on an open connection.
+
+        :param sock: connected socket
+        :param request: json request string
+        :return: encrypted response and whether the connection can be reused
+        """
+        _LOGGER.debug("> (%i) %s", len(request), request)
+        sock.sendall(TPLinkSmartHomeProtocol.encrypt(request))
+
+        buffer = bytes()
+        while True:
+            chunk = sock.recv(4096)
+            buffer += chunk
+            keep_open = TPLinkSmartHomeProtocol._response_complete(buffer, chunk)
+            if keep_open is not None:
+                return buffer, keep_open
+
+    @staticmethod
+    def _response_complete(buffer: bytes, chunk: bytes) -> Optional[bool]:
+        """Check whether a response has been received completely.
+
+        Some devices send responses with a length header of 0 and
+        terminate with a zero size chunk. Others send the length and
+        will hang if we attempt to read more data.
+
+        :param buffer: data received so far, including chunk
+        :param chunk: the chunk received last
+        :return: None if more data is expected, otherwise whether the
+                 connection can be used for further requests
+        :raises ConnectionError: if the connection was closed before
+                                 receiving a response
+        """
+        if not chunk:
+            if len(buffer) < 4:
+                raise ConnectionError("Connection closed by the device")
+            return False
+
+        if len(buffer) >= 4:
+            length = struct.unpack(">I", buffer[0:4])[0]
+            if length > 0 and len(buffer) >= length + 4:
+                return True
+
+        return None
+
+    @staticmethod
+    def _close_socket(sock: socket.socket) -> None:
         try:
-            sock = socket.create_connection((host, port), timeout)
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            # OSX raises OSError when shutdown() gets called on a closed
+            # socket. We ignore it here as there is nothing left to read.
+            pass
+        finally:
+            sock.close()
 
+    @staticmethod
+    def send(host: str, request: Union[str, Dict], port: int = DEFAULT_PORT) -> None:
+        """Send a request to a TP-Link SmartHome Device without awaiting a reply.
+
+        The request is sent on a new connection, which is closed right away,
+        so the reply of the device is discarded.
+
+        :param str host: host name or ip address of the device
+        :param int port: port on the device (default: 9999)
+        :param request: command to send to the device (can be either dict or
+        json string)
+        """
+        if isinstance(request, dict):
+            request = json.dumps(request)
+
+        timeout = TPLinkSmartHomeProtocol.DEFAULT_TIMEOUT
+        with socket.create_connection((host, port), timeout) as sock:
             _LOGGER.debug("> (%i) %s", len(request), request)
-            sock.send(TPLinkSmartHomeProtocol.encrypt(request))
+            sock.sendall(TPLinkSmartHomeProtocol.encrypt(request))
+
+    @staticmethod
+    async def async_query(
+        host: str, request: Union[str, Dict], port: int = DEFAULT_PORT
+    ) -> Any:
+        """Request information from a TP-Link SmartHome Device using asyncio.
+
+        :param str host: host name or ip address of the device
+        :param int port: port on the device (default: 9999)
+        :param request: command to send to the device (can be either dict or
+        json string)
+        :return: response dict
+        """
+        if isinstance(request, dict):
+            request = json.dumps(request)
+
+        timeout = TPLinkSmartHomeProtocol.DEFAULT_TIMEOUT
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port), timeout
+        )
+        try:
+            _LOGGER.debug("> (%i) %s", len(request), request)
+            writer.write(TPLinkSmartHomeProtocol.encrypt(request))
+            await writer.drain()
 
             buffer = bytes()
-            # Some devices send responses with a length header of 0 and
-            # terminate with a zero size chunk. Others send the length and
-            # will hang if we attempt to read more data.
-            length = -1
-            while True:
-                chunk = sock.recv(4096)
-                if length == -1:
-                    length = struct.unpack(">I", chunk[0:4])[0]
+            complete = None  # type: Optional[bool]
+            while complete is None:
+                chunk = await asyncio.wait_for(reader.read(4096), timeout)
                 buffer += chunk
-                if (length > 0 and len(buffer) >= length + 4) or not chunk:
-                    break
-
+                complete = TPLinkSmartHomeProtocol._response_complete(buffer, chunk)
         finally:
-            try:
-                if sock:
-                    sock.shutdown(socket.SHUT_RDWR)
-            except OSError:
-                # OSX raises OSError when shutdown() gets called on a closed
-                # socket. We ignore it here as the data has already been read
-                # into the buffer at this point.
-                pass
-
-            finally:
-                if sock:
-                    sock.close()
+            writer.close()
+            # wait_closed() is only available on Python 3.7 and newer
+            if hasattr(writer, "wait_closed"):
+                try:
+                    await writer.wait_closed()
+                except ConnectionError:
+                    # the device has already reset the connection
+                    pass
 
         response = TPLinkSmartHomeProtocol.decrypt(buffer[4:])
         _LOGGER.debug("< (%i) %s", len(response), response)
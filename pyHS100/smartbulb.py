@@ -2,8 +2,9 @@ from pyHS100 import DeviceType, SmartDevice, SmartDeviceException
 from .protocol import TPLinkSmartHomeProtocol
 from deprecation import deprecated
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 
 TPLINK_KELVIN = {
@@ -12,10 +13,34 @@ TPLINK_KELVIN = {
     "LB230": (2500, 9000),
     "KB130": (2500, 9000),
     "KL130": (2500, 9000),
-    "KL120\(EU\)": (2700, 6500),
-    "KL120\(US\)": (2700, 5000),
+    r"KL120\(EU\)": (2700, 6500),
+    r"KL120\(US\)": (2700, 5000),
 }
 
+# Most entries are plain model prefixes which can be looked up directly,
+# only the remaining ones need to be matched as regular expressions.
+_TPLINK_KELVIN_PREFIX_LEN = 5
+_TPLINK_KELVIN_PREFIX = {
+    model: temp_range
+    for model, temp_range in TPLINK_KELVIN.items()
+    if re.escape(model) == model and len(model) == _TPLINK_KELVIN_PREFIX_LEN
+}
+_TPLINK_KELVIN_COMPILED = [
+    (re.compile(model), temp_range)
+    for model, temp_range in TPLINK_KELVIN.items()
+    if model not in _TPLINK_KELVIN_PREFIX
+]
+
+# (name, minimum, maximum, unit) for each member of an HSV tuple
+_HSV_BOUNDS = (
+    ("hue", 0, 360, ""),
+    ("saturation", 0, 100, "%"),
+    ("brightness", 0, 100, "%"),
+)
+
+# on_off values for the states accepted by the deprecated state setter
+_STATE_MAP = {SmartDevice.STATE_ON: 1, SmartDevice.STATE_OFF: 0}
+
 
 class SmartBulb(SmartDevice):
     """Representation of a TP-Link Smart Bulb.
@@ -55,11 +80,22 @@ class SmartBulb(SmartDevice):
     # check the current brightness
     print(p.brightness)
 
+    # change several settings using a single command
+    p.set_state(brightness=50, color_temp=3000)
+
     Errors reported by the device are raised as SmartDeviceExceptions,
     and should be handled by the user of the library.
+
+    Bulbs use __slots__ and have no instance __dict__, so no attributes
+    can be added to them. To mock a method, patch it on the class instead
+    of on the instance.
     """
 
+    __slots__ = ("_valid_temp_range",)
+
     LIGHT_SERVICE = "smartlife.iot.smartbulb.lightingservice"
+    _GET_LIGHT_STATE = "get_light_state"
+    _SET_LIGHT_STATE = "transition_light_state"
 
     def __init__(
         self,
@@ -73,6 +109,7 @@ class SmartBulb(SmartDevice):
         )
         self.emeter_type = "smartlife.iot.common.emeter"
         self._device_type = DeviceType.Bulb
+        self._valid_temp_range = None  # type: Optional[Tuple[int, int]]
 
     @property
     def is_color(self) -> bool:
@@ -81,7 +118,7 @@ class SmartBulb(SmartDevice):
         :return: True if the bulb supports color changes, False otherwise
         :rtype: bool
         """
-        return bool(self.sys_info["is_color"])
+        return self.sys_info["is_color"] == 1
 
     @property
     def is_dimmable(self) -> bool:
@@ -90,7 +127,7 @@ class SmartBulb(SmartDevice):
         :return: True if the bulb supports brightness changes, False otherwise
         :rtype: bool
         """
-        return bool(self.sys_info["is_dimmable"])
+        return self.sys_info["is_dimmable"] == 1
 
     @property
     def is_variable_color_temp(self) -> bool:
@@ -100,7 +137,7 @@ class SmartBulb(SmartDevice):
         otherwise
         :rtype: bool
         """
-        return bool(self.sys_info["is_variable_color_temp"])
+        return self.sys_info["is_variable_color_temp"] == 1
 
     @property
     def valid_temperature_range(self) -> Tuple[int, int]:
@@ -109,20 +146,115 @@ class SmartBulb(SmartDevice):
         :return: White temperature range in Kelvin (minimun, maximum)
         :rtype: tuple
         """
-        if not self.is_variable_color_temp:
+        return self._get_valid_temperature_range()
+
+    def _get_valid_temperature_range(
+        self, sys_info: Optional[Dict[str, Any]] = None
+    ) -> Tuple[int, int]:
+        """Return the temperature range, computing it on first use.
+
+        :param sys_info: already fetched sys_info, queried if not given
+        """
+        # The model of a device never changes, so this is computed only once.
+        if self._valid_temp_range is None:
+            if sys_info is None:
+                sys_info = self.sys_info
+            self._valid_temp_range = self._temperature_range_for(sys_info)
+
+        return self._valid_temp_range
+
+    @staticmethod
+    def _temperature_range_for(sys_info: Dict[str, Any]) -> Tuple[int, int]:
+        """Look up the white temperature range for the model in sys_info."""
+        if sys_info["is_variable_color_temp"] != 1:
             return (0, 0)
-        for model, temp_range in TPLINK_KELVIN.items():
-            if re.match(model, self.sys_info["model"]):
+
+        model = sys_info["model"]
+        temp_range = _TPLINK_KELVIN_PREFIX.get(model[:_TPLINK_KELVIN_PREFIX_LEN])
+        if temp_range is not None:
+            return temp_range
+        for pattern, temp_range in _TPLINK_KELVIN_COMPILED:
+            if pattern.match(model):
                 return temp_range
         return (0, 0)
 
     def get_light_state(self) -> Dict:
         """Query the light state."""
-        return self._query_helper(self.LIGHT_SERVICE, "get_light_state")
+        return self._query_helper(self.LIGHT_SERVICE, self._GET_LIGHT_STATE)
+
+    def set_light_state(self, state: Dict, rapid: bool = False) -> Optional[Dict]:
+        """Set the light state.
+
+        Setting rapid only skips waiting for the reply: the command is still
+        sent over a new connection, which is closed right after sending, so
+        the reply is discarded and errors reported by the bulb go unnoticed.
+
+        :param dict state: light state fields to change
+        :param bool rapid: send the command without waiting for the reply,
+                           useful for updating many bulbs in quick succession
+        :return: the resulting light state, None if rapid is set
+        """
+        if rapid:
+            # sysinfo embeds the light state, so it has to be refetched as well.
+            self._invalidate_cache("system")
+            self._send_helper(self.LIGHT_SERVICE, self._SET_LIGHT_STATE, state)
+            return None
+
+        return self._transition_light_state(state)
+
+    def _transition_light_state(self, state: Dict) -> Dict:
+        """Set the light state and return the resulting one."""
+        self._invalidate_cache("system")
+        light_state = self._query_helper(
+            self.LIGHT_SERVICE, self._SET_LIGHT_STATE, state
+        )
+        self._cache_light_state(light_state)
+        return light_state
+
+    @classmethod
+    def bulk_set_state(
+        cls, bulbs: Iterable["SmartBulb"], state: Dict
+    ) -> List[Optional[Dict]]:
+        """Set the same light state on several bulbs in parallel.
+
+        :param bulbs: bulbs to update
+        :param dict state: light state fields to change
+        :return: the resulting light state of each bulb, in order
+        :raises SmartDeviceException: if updating any of the bulbs failed
+        """
+        bulbs = list(bulbs)
+        if not bulbs:
+            return []
+
+        with ThreadPoolExecutor(max_workers=len(bulbs)) as executor:
+            return list(executor.map(lambda bulb: bulb.set_light_state(state), bulbs))
+
+    async def set_light_state_async(self, state: Dict) -> Dict:
+        """Set the light state without blocking the event loop.
 
-    def set_light_state(self, state: Dict) -> Dict:
-        """Set the light state."""
-        return self._query_helper(self.LIGHT_SERVICE, "transition_light_state", state)
+        This allows updating several bulbs concurrently, e.g. using
+        asyncio.gather(*[bulb.set_light_state_async(state) for bulb in bulbs])
+
+        :param dict state: light state fields to change
+        :return: the resulting light state
+        """
+        self._invalidate_cache("system")
+        light_state = await self._async_query_helper(
+            self.LIGHT_SERVICE, self._SET_LIGHT_STATE, state
+        )
+        self._cache_light_state(light_state)
+        return light_state
+
+    def _cache_light_state(self, light_state: Dict) -> None:
+        """Cache the light state replied to a transition."""
+        # The bulb replies with its resulting light state, which can be
+        # served to the getters instead of querying it again right away.
+        if "on_off" in light_state:
+            self._insert_to_cache(
+                self.LIGHT_SERVICE,
+                self._GET_LIGHT_STATE,
+                {self.LIGHT_SERVICE: {self._GET_LIGHT_STATE: light_state}},
+            )
 
     @property
     def hsv(self) -> Tuple[int, int, int]:
@@ -135,27 +267,32 @@ class SmartBulb(SmartDevice):
         if not self.is_color:
             raise SmartDeviceException("Bulb does not support color.")
 
-        light_state = self.get_light_state()
-        if not self.is_on:
-            hue = light_state["dft_on_state"]["hue"]
-            saturation = light_state["dft_on_state"]["saturation"]
-            value = light_state["dft_on_state"]["brightness"]
-        else:
-            hue = light_state["hue"]
-            saturation = light_state["saturation"]
-            value = light_state["brightness"]
+        return self._hsv_from(self.get_light_state())
 
-        return hue, saturation, value
+    @staticmethod
+    def _hsv_from(light_state: Dict) -> Tuple[int, int, int]:
+        """Extract the HSV tuple from an already fetched light state."""
+        src = light_state if light_state["on_off"] else light_state["dft_on_state"]
+        return src["hue"], src["saturation"], src["brightness"]
 
     @hsv.setter  # type: ignore
     @deprecated(details="Use set_hsv()")
     def hsv(self, state: Tuple[int, int, int]):
         return self.set_hsv(state[0], state[1], state[2])
 
-    def _raise_for_invalid_brightness(self, value):
-        if not isinstance(value, int) or not (0 <= value <= 100):
+    @staticmethod
+    def _raise_for_invalid_brightness(value: int) -> None:
+        SmartBulb._raise_for_invalid_hsv_value(_HSV_BOUNDS[2], value)
+
+    @staticmethod
+    def _raise_for_invalid_hsv_value(
+        bounds: Tuple[str, int, int, str], value: int
+    ) -> None:
+        name, low, high, unit = bounds
+        if type(value) is not int or not (low <= value <= high):
             raise ValueError(
-                "Invalid brightness value: {} " "(valid range: 0-100%)".format(value)
+                "Invalid {} value: {} "
+                "(valid range: {}-{}{})".format(name, value, low, high, unit)
             )
 
     def set_hsv(self, hue: int, saturation: int, value: int):
@@ -166,18 +303,8 @@ class SmartBulb(SmartDevice):
         if not self.is_color:
             raise SmartDeviceException("Bulb does not support color.")
 
-        if not isinstance(hue, int) or not (0 <= hue <= 360):
-            raise ValueError(
-                "Invalid hue value: {} " "(valid range: 0-360)".format(hue)
-            )
-
-        if not isinstance(saturation, int) or not (0 <= saturation <= 100):
-            raise ValueError(
-                "Invalid saturation value: {} "
-                "(valid range: 0-100%)".format(saturation)
-            )
-
-        self._raise_for_invalid_brightness(value)
+        for bounds, val in zip(_HSV_BOUNDS, (hue, saturation, value)):
+            self._raise_for_invalid_hsv_value(bounds, val)
 
         light_state = {
             "hue": hue,
@@ -197,11 +324,13 @@ class SmartBulb(SmartDevice):
         if not self.is_variable_color_temp:
             raise SmartDeviceException("Bulb does not support colortemp.")
 
-        light_state = self.get_light_state()
-        if not self.is_on:
-            return int(light_state["dft_on_state"]["color_temp"])
-        else:
-            return int(light_state["color_temp"])
+        return self._color_temp_from(self.get_light_state())
+
+    @staticmethod
+    def _color_temp_from(light_state: Dict) -> int:
+        """Extract the color temperature from an already fetched light state."""
+        src = light_state if light_state["on_off"] else light_state["dft_on_state"]
+        return int(src["color_temp"])
 
     @color_temp.setter  # type: ignore
     @deprecated(details="use set_color_temp")
@@ -213,21 +342,22 @@ class SmartBulb(SmartDevice):
 
         :param int temp: The new color temperature, in Kelvin
         """
+        self._raise_for_invalid_color_temp(temp)
+
+        light_state = {"color_temp": temp}
+        self.set_light_state(light_state)
+
+    def _raise_for_invalid_color_temp(self, temp):
         if not self.is_variable_color_temp:
             raise SmartDeviceException("Bulb does not support colortemp.")
 
-        if (
-            temp < self.valid_temperature_range[0]
-            or temp > self.valid_temperature_range[1]
-        ):
+        valid_temperature_range = self.valid_temperature_range
+        if temp < valid_temperature_range[0] or temp > valid_temperature_range[1]:
             raise ValueError(
                 "Temperature should be between {} "
-                "and {}".format(*self.valid_temperature_range)
+                "and {}".format(*valid_temperature_range)
             )
 
-        light_state = {"color_temp": temp}
-        self.set_light_state(light_state)
-
     @property
     def brightness(self) -> int:
         """Current brightness of the device.
@@ -238,11 +368,13 @@ class SmartBulb(SmartDevice):
         if not self.is_dimmable:  # pragma: no cover
             raise SmartDeviceException("Bulb is not dimmable.")
 
-        light_state = self.get_light_state()
-        if not self.is_on:
-            return int(light_state["dft_on_state"]["brightness"])
-        else:
-            return int(light_state["brightness"])
+        return self._brightness_from(self.get_light_state())
+
+    @staticmethod
+    def _brightness_from(light_state: Dict) -> int:
+        """Extract the brightness from an already fetched light state."""
+        src = light_state if light_state["on_off"] else light_state["dft_on_state"]
+        return int(src["brightness"])
 
     @brightness.setter  # type: ignore
     @deprecated(details="use set_brightness")
@@ -262,6 +394,55 @@ class SmartBulb(SmartDevice):
         light_state = {"brightness": brightness}
         self.set_light_state(light_state)
 
+    def set_state(
+        self,
+        hue: Optional[int] = None,
+        saturation: Optional[int] = None,
+        brightness: Optional[int] = None,
+        color_temp: Optional[int] = None,
+        on_off: Optional[bool] = None,
+    ) -> Dict:
+        """Change several light state fields using a single command.
+
+        Prefer this over calling the individual setters one after another
+        when more than one field is to be changed, as each of them is sent
+        to the bulb separately. Fields left to None are not changed.
+        Setting hue or saturation switches the bulb to color mode, so these
+        cannot be combined with color_temp.
+
+        :param int hue: hue in degrees
+        :param int saturation: saturation in percent
+        :param int brightness: brightness in percent
+        :param int color_temp: color temperature in Kelvin
+        :param bool on_off: whether the bulb should be turned on or off
+        :return: the resulting light state
+        """
+        set_color = hue is not None or saturation is not None
+        if set_color and not self.is_color:
+            raise SmartDeviceException("Bulb does not support color.")
+        if set_color and color_temp is not None:
+            raise ValueError("Color temperature cannot be set together with color.")
+        if brightness is not None and not self.is_dimmable:  # pragma: no cover
+            raise SmartDeviceException("Bulb is not dimmable.")
+
+        light_state = {}  # type: Dict[str, int]
+        for bounds, val in zip(_HSV_BOUNDS, (hue, saturation, brightness)):
+            if val is not None:
+                self._raise_for_invalid_hsv_value(bounds, val)
+                light_state[bounds[0]] = val
+
+        if set_color:
+            # the bulb stays in white mode while color_temp is non-zero
+            light_state["color_temp"] = 0
+        elif color_temp is not None:
+            self._raise_for_invalid_color_temp(color_temp)
+            light_state["color_temp"] = color_temp
+
+        if on_off is not None:
+            light_state["on_off"] = int(on_off)
+
+        return self._transition_light_state(light_state)
+
     @property  # type: ignore
     @deprecated(details="use is_on() and is_off()")
     def state(self) -> str:
@@ -286,12 +467,10 @@ class SmartBulb(SmartDevice):
                            STATE_ON
                            STATE_OFF
         """
-        if bulb_state == self.STATE_ON:
-            new_state = 1
-        elif bulb_state == self.STATE_OFF:
-            new_state = 0
-        else:
-            raise ValueError
+        try:
+            new_state = _STATE_MAP[bulb_state]
+        except (KeyError, TypeError):
+            raise ValueError("State {} is not valid.".format(bulb_state))
 
         light_state = {"on_off": new_state}
         self.set_light_state(light_state)
@@ -303,17 +482,27 @@ class SmartBulb(SmartDevice):
         :return: Bulb information dict, keys in user-presentable form.
         :rtype: dict
         """
-        info = {
-            "Brightness": self.brightness,
-            "Is dimmable": self.is_dimmable,
-        }  # type: Dict[str, Any]
-        if self.is_variable_color_temp:
-            info["Color temperature"] = self.color_temp
-            info["Valid temperature range"] = self.valid_temperature_range
-        if self.is_color:
-            info["HSV"] = self.hsv
-
-        return info
+        sys_info = self.sys_info
+        light_state = self.get_light_state()
+
+        is_variable_color_temp = sys_info["is_variable_color_temp"] == 1
+        is_color = sys_info["is_color"] == 1
+
+        if is_variable_color_temp:
+            temp_range = self._get_valid_temperature_range(sys_info)
+            color_temp_info = {
+                "Color temperature": self._color_temp_from(light_state),
+                "Valid temperature range": temp_range,
+            }
+        else:
+            color_temp_info = {}
+
+        return {
+            "Brightness": self._brightness_from(light_state),
+            "Is dimmable": sys_info["is_dimmable"] == 1,
+            **color_temp_info,
+            **({"HSV": self._hsv_from(light_state)} if is_color else {}),
+        }
 
     @property
     def is_on(self) -> bool:
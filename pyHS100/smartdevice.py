@@ -81,7 +81,23 @@ class EmeterStatus(dict):
 
 
 class SmartDevice:
-    """Base class for all supported device types."""
+    """Base class for all supported device types.
+
+    The attributes are declared in __slots__, so instances of this class
+    and of subclasses declaring their own __slots__ have no __dict__.
+    """
+
+    __slots__ = (
+        "host",
+        "protocol",
+        "emeter_type",
+        "context",
+        "num_children",
+        "cache_ttl",
+        "cache",
+        "_device_type",
+        "__weakref__",
+    )
 
     STATE_ON = "ON"
     STATE_OFF = "OFF"
@@ -112,7 +128,9 @@ class SmartDevice:
             self.context,
             self.cache_ttl,
         )
-        self.cache = defaultdict(lambda: defaultdict(lambda: None))
+        self.cache = defaultdict(
+            lambda: defaultdict(lambda: None)
+        )  # type: Dict[str, Dict[str, Any]]
         self._device_type = DeviceType.Unknown
 
     def _result_from_cache(self, target, cmd) -> Optional[Dict]:
@@ -135,11 +153,18 @@ class SmartDevice:
                 _LOGGER.debug("Got cached %s %s", target, cmd)
                 return self.cache[target][cmd]
             else:
-                _LOGGER.debug("Invalidating the cache for %s cmd %s", target, cmd)
-                for cache_entry in self.cache[target].values():
-                    cache_entry["last_updated"] = datetime.utcfromtimestamp(0)
+                self._invalidate_cache(target)
         return None
 
+    def _invalidate_cache(self, target: str) -> None:
+        """Expire all cached query results for the given target.
+
+        :param target: Target system
+        """
+        _LOGGER.debug("Invalidating the cache for %s", target)
+        for cache_entry in self.cache[target].values():
+            cache_entry["last_updated"] = datetime.utcfromtimestamp(0)
+
     def _insert_to_cache(self, target: str, cmd: str, response: Dict) -> None:
         """Internal function to add response to cache.
 
@@ -150,6 +175,22 @@ class SmartDevice:
         self.cache[target][cmd] = response.copy()
         self.cache[target][cmd]["last_updated"] = datetime.utcnow()
 
+    def _create_request(
+        self, target: str, cmd: str, arg: Optional[Dict] = None
+    ) -> Dict:
+        """Create a request for the device, adding the context if needed.
+
+        :param target: Target system {system, time, emeter, ..}
+        :param cmd: Command to execute
+        :param arg: JSON object passed as parameter to the command
+        :return: request to be passed to the protocol
+        :rtype: dict
+        """
+        if self.context is None:
+            return {target: {cmd: arg}}
+
+        return {"context": {"child_ids": [self.context]}, target: {cmd: arg}}
+
     def _query_helper(self, target: str, cmd: str, arg: Optional[Dict] = None) -> Any:
         """Handle result unwrapping and error handling.
 
@@ -160,10 +201,12 @@ class SmartDevice:
         :rtype: dict
         :raises SmartDeviceException: if command was not executed correctly
         """
-        if self.context is None:
-            request = {target: {cmd: arg}}
-        else:
-            request = {"context": {"child_ids": [self.context]}, target: {cmd: arg}}
+        request = self._create_request(target, cmd, arg)
+
+        # Any command that is not a getter may change the device state,
+        # so the results cached for the target are stale from now on.
+        if not cmd.startswith("get_"):
+            self._invalidate_cache(target)
 
         try:
             response = self._result_from_cache(target, cmd)
@@ -176,6 +219,66 @@ class SmartDevice:
                 "Communication error on %s:%s" % (target, cmd)
             ) from ex
 
+        return self._unwrap_response(target, cmd, response)
+
+    async def _async_query_helper(
+        self, target: str, cmd: str, arg: Optional[Dict] = None
+    ) -> Any:
+        """Query the device without blocking the event loop.
+
+        The cache is bypassed, but invalidated for commands which are not
+        getters like it is done by :func:`_query_helper`.
+
+        :param target: Target system {system, time, emeter, ..}
+        :param cmd: Command to execute
+        :param arg: JSON object passed as parameter to the command
+        :return: Unwrapped result for the call.
+        :rtype: dict
+        :raises SmartDeviceException: if command was not executed correctly
+        """
+        request = self._create_request(target, cmd, arg)
+
+        if not cmd.startswith("get_"):
+            self._invalidate_cache(target)
+
+        try:
+            response = await self.protocol.async_query(host=self.host, request=request)
+        except Exception as ex:
+            raise SmartDeviceException(
+                "Communication error on %s:%s" % (target, cmd)
+            ) from ex
+
+        return self._unwrap_response(target, cmd, response)
+
+    def _send_helper(self, target: str, cmd: str, arg: Optional[Dict] = None) -> None:
+        """Send a command to the device without waiting for its response.
+
+        :param target: Target system {system, time, emeter, ..}
+        :param cmd: Command to execute
+        :param arg: JSON object passed as parameter to the command
+        :raises SmartDeviceException: if the command could not be sent
+        """
+        request = self._create_request(target, cmd, arg)
+
+        self._invalidate_cache(target)
+
+        try:
+            self.protocol.send(host=self.host, request=request)
+        except Exception as ex:
+            raise SmartDeviceException(
+                "Communication error on %s:%s" % (target, cmd)
+            ) from ex
+
+    def _unwrap_response(self, target: str, cmd: str, response: Dict) -> Any:
+        """Unwrap the result for a command from the device response.
+
+        :param target: Target system {system, time, emeter, ..}
+        :param cmd: Executed command
+        :param response: Response received from the device
+        :return: Unwrapped result for the call.
+        :rtype: dict
+        :raises SmartDeviceException: if command was not executed correctly
+        """
         if target not in response:
             raise SmartDeviceException(
                 "No required {} in response: {}".format(target, response)
@@ -551,6 +654,10 @@ class SmartDevice:
         """
         self._query_helper("system", "reboot", {"delay": delay})
 
+    def close(self) -> None:
+        """Close the connection kept open to the device."""
+        self.protocol.close(self.host)
+
     def turn_off(self) -> None:
         """Turn off the device."""
         raise NotImplementedError("Device subclass needs to implement this.")
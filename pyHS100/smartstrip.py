@@ -46,7 +46,7 @@ class SmartStrip(SmartPlug):
         self.num_children = len(children)
         for plug in range(self.num_children):
             self.plugs[plug] = SmartPlug(
-                host, protocol, context=children[plug]["id"], cache_ttl=cache_ttl
+                host, self.protocol, context=children[plug]["id"], cache_ttl=cache_ttl
             )
 
     def raise_for_index(self, index: int):
@@ -2,6 +2,7 @@ import pytest
 import glob
 import json
 import os
+from unittest.mock import patch
 from .newfakes import FakeTransportProtocol
 from os.path import basename
 from pyHS100 import SmartPlug, SmartBulb, SmartStrip, Discover
@@ -70,6 +71,16 @@ def handle_turn_on(dev, turn_on):
         dev.turn_off()
 
 
+def spy_bulb_method(name):
+    """Patch a SmartBulb method to record its calls, still calling through.
+
+    Bulbs use __slots__, so the method has to be patched on the class.
+    """
+    return patch.object(
+        SmartBulb, name, autospec=True, side_effect=getattr(SmartBulb, name)
+    )
+
+
 @pytest.fixture(params=SUPPORTED_DEVICES)
 def dev(request):
     file = request.param
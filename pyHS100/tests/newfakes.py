@@ -397,6 +397,12 @@ class FakeTransportProtocol(TPLinkSmartHomeProtocol):
         "smartlife.iot.dimmer": {"set_brightness": set_hs220_brightness},
     }
 
+    def send(self, host, request, port=9999):
+        self.query(host, request, port)
+
+    async def async_query(self, host, request, port=9999):
+        return self.query(host, request, port)
+
     def query(self, host, request, port=9999):
         proto = self.proto
 
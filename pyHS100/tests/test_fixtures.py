@@ -1,10 +1,20 @@
+import asyncio
 import datetime
+import warnings
 
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 import pytest
 
-from pyHS100 import DeviceType, SmartStripException, SmartDeviceException
+from pyHS100 import (
+    DeviceType,
+    Discover,
+    SmartBulb,
+    SmartStrip,
+    SmartStripException,
+    SmartDeviceException,
+    TPLinkSmartHomeProtocol,
+)
 from .newfakes import (
     BULB_SCHEMA,
     PLUG_SCHEMA,
@@ -15,6 +25,7 @@ from .newfakes import (
 from .conftest import (
     turn_on,
     handle_turn_on,
+    spy_bulb_method,
     plug,
     strip,
     bulb,
@@ -350,6 +361,22 @@ def test_invalid_brightness(dev):
         dev.set_brightness(-100)
 
 
+@bulb
+def test_invalid_brightness_type(dev):
+    for invalid_brightness in [True, 0.5, "50"]:
+        with pytest.raises(ValueError):
+            dev.set_brightness(invalid_brightness)
+        with pytest.raises(ValueError):
+            dev.set_state(brightness=invalid_brightness)
+
+
+@bulb
+def test_bulb_slots(dev):
+    assert not hasattr(dev, "__dict__")
+    with pytest.raises(AttributeError):
+        dev.unknown_attribute = 1
+
+
 @color_bulb
 @turn_on
 def test_hsv(dev, turn_on):
@@ -436,6 +463,31 @@ def test_deprecated_hsv(dev, turn_on):
         dev.hsv = (1, 1, 1)
 
 
+@strip
+def test_children_share_protocol(dev):
+    # without an explicit protocol the strip creates its own one
+    with patch.object(
+        TPLinkSmartHomeProtocol, "query", side_effect=dev.protocol.query
+    ):
+        parent = SmartStrip(dev.host, cache_ttl=0)
+
+    assert parent.num_children > 0
+    for child in parent.plugs.values():
+        assert child.protocol is parent.protocol
+
+
+def test_close(dev):
+    with patch.object(dev.protocol, "close") as close:
+        dev.close()
+    close.assert_called_once_with(dev.host)
+
+
+def test_discover_single_uses_protocol(dev):
+    found = Discover.discover_single(dev.host, protocol=dev.protocol)
+    assert isinstance(found, type(dev))
+    assert found.protocol is dev.protocol
+
+
 @strip
 def test_children_is_on(dev):
     is_on = dev.get_is_on()
@@ -661,3 +713,241 @@ def test_representation(dev):
     pattern = re.compile("<.* model .* at .* (.*), is_on: .* - dev specific: .*>")
     assert pattern.match(str(dev))
 
+
+@bulb
+def test_cache_invalidates_on_light_state_change(dev):
+    # the dev fixture disables caching, enable it for this test
+    dev.cache_ttl = datetime.timedelta(seconds=3)
+
+    with patch.object(
+        FakeTransportProtocol, "query", wraps=dev.protocol.query
+    ) as query_mock:
+        dev.get_sysinfo()
+        dev.get_light_state()
+        assert query_mock.call_count == 2
+
+        dev.turn_on()
+        assert query_mock.call_count == 3
+
+        dev.get_sysinfo()
+        dev.get_light_state()
+        assert query_mock.call_count == 5
+
+
+@bulb
+def test_state_information_single_light_state_query(dev):
+    with spy_bulb_method("get_light_state") as ls_mock:
+        dev.state_information
+        assert ls_mock.call_count == 1
+
+
+@bulb
+def test_state_information_queries(dev):
+    with patch.object(
+        FakeTransportProtocol, "query", wraps=dev.protocol.query
+    ) as query_mock:
+        dev.state_information
+        # one sysinfo and one light state query, also on the first call
+        assert query_mock.call_count == 2
+
+
+@variable_temp
+def test_valid_temperature_range(dev):
+    low, high = dev.valid_temperature_range
+    assert 0 < low < high
+
+    if dev.model.startswith("KL120(US)"):
+        assert (low, high) == (2700, 5000)
+
+
+@bulb
+def test_valid_temperature_range_memoized(dev):
+    temp_range = dev.valid_temperature_range
+
+    with patch.object(
+        FakeTransportProtocol, "query", wraps=dev.protocol.query
+    ) as query_mock:
+        assert dev.valid_temperature_range == temp_range
+        assert query_mock.call_count == 0
+
+
+@bulb
+@turn_on
+def test_light_state_getters_single_query(dev, turn_on):
+    handle_turn_on(dev, turn_on)
+    getters = ["brightness"]
+    if dev.is_variable_color_temp:
+        getters.append("color_temp")
+    if dev.is_color:
+        getters.append("hsv")
+
+    for getter in getters:
+        with spy_bulb_method("get_light_state") as ls_mock:
+            getattr(dev, getter)
+            assert ls_mock.call_count == 1
+
+
+@bulb
+def test_set_light_state_caches_reply(dev):
+    # the dev fixture disables caching, enable it for this test
+    dev.cache_ttl = datetime.timedelta(seconds=3)
+    new_state = {
+        "on_off": 1,
+        "mode": "normal",
+        "hue": 0,
+        "saturation": 0,
+        "color_temp": 2700,
+        "brightness": 42,
+    }
+    reply = {
+        dev.LIGHT_SERVICE: {"transition_light_state": dict(new_state, err_code=0)}
+    }
+
+    with patch.object(
+        FakeTransportProtocol, "query", return_value=reply
+    ) as query_mock:
+        dev.set_light_state({"brightness": 42})
+        assert dev.get_light_state() == new_state
+        assert query_mock.call_count == 1
+
+
+@bulb
+def test_set_light_state_rapid(dev):
+    dev.turn_off()
+
+    with patch.object(
+        FakeTransportProtocol, "query", wraps=dev.protocol.query
+    ) as query_mock:
+        assert dev.set_light_state({"on_off": 1}, rapid=True) is None
+        assert query_mock.call_count == 1
+
+    assert dev.is_on
+
+
+@bulb
+def test_set_light_state_async(dev):
+    dev.turn_off()
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(dev.set_light_state_async({"on_off": 1}))
+    finally:
+        loop.close()
+
+    assert dev.is_on
+
+
+@variable_temp
+@turn_on
+def test_set_state(dev, turn_on):
+    handle_turn_on(dev, turn_on)
+
+    with spy_bulb_method("_transition_light_state") as set_mock:
+        dev.set_state(brightness=20, color_temp=2700)
+        assert set_mock.call_count == 1
+        assert set_mock.call_args[0][1] == {"brightness": 20, "color_temp": 2700}
+
+    assert dev.brightness == 20
+    assert dev.color_temp == 2700
+
+    with pytest.raises(ValueError):
+        dev.set_state(brightness=101)
+    with pytest.raises(ValueError):
+        dev.set_state(color_temp=1000)
+
+
+@color_bulb
+@turn_on
+def test_set_state_color(dev, turn_on):
+    handle_turn_on(dev, turn_on)
+
+    with spy_bulb_method("_transition_light_state") as set_mock:
+        dev.set_state(hue=10, saturation=20, brightness=30)
+        assert set_mock.call_count == 1
+        assert set_mock.call_args[0][1] == {
+            "hue": 10,
+            "saturation": 20,
+            "brightness": 30,
+            "color_temp": 0,
+        }
+
+    assert dev.hsv == (10, 20, 30)
+
+    with spy_bulb_method("_transition_light_state") as set_mock:
+        dev.set_state(hue=40)
+        assert set_mock.call_args[0][1] == {"hue": 40, "color_temp": 0}
+
+    with pytest.raises(ValueError):
+        dev.set_state(hue=361)
+    with pytest.raises(ValueError):
+        dev.set_state(saturation=10, color_temp=2700)
+
+
+@non_color_bulb
+def test_set_state_color_on_non_color(dev):
+    with pytest.raises(SmartDeviceException):
+        dev.set_state(hue=0)
+
+
+@bulb
+def test_is_on_single_light_state_query(dev):
+    with spy_bulb_method("get_light_state") as ls_mock:
+        with warnings.catch_warnings():
+            # the deprecated state property must not be involved
+            warnings.simplefilter("error", DeprecationWarning)
+            dev.is_on
+        assert ls_mock.call_count == 1
+
+
+@bulb
+def test_turn_on_off_set_light_state_directly(dev):
+    with spy_bulb_method("set_light_state") as set_mock:
+        with warnings.catch_warnings():
+            # the deprecated state setter must not be involved
+            warnings.simplefilter("error", DeprecationWarning)
+            dev.turn_off()
+            dev.turn_on()
+
+        assert [c[0][1] for c in set_mock.call_args_list] == [
+            {"on_off": 0},
+            {"on_off": 1},
+        ]
+
+
+@bulb
+def test_bulk_set_state(dev):
+    assert SmartBulb.bulk_set_state([], {"on_off": 1}) == []
+
+    # additional bulbs sharing the fake device of dev
+    bulbs = [dev] + [
+        SmartBulb(host, protocol=dev.protocol, cache_ttl=0)
+        for host in ["127.0.0.2", "127.0.0.3"]
+    ]
+
+    dev.turn_off()
+    with spy_bulb_method("set_light_state") as set_mock:
+        SmartBulb.bulk_set_state(bulbs, {"on_off": 1})
+        assert sorted(c[0][0].host for c in set_mock.call_args_list) == sorted(
+            bulb.host for bulb in bulbs
+        )
+    assert all(bulb.is_on for bulb in bulbs)
+
+    # results are returned in the order of the bulbs
+    with patch.object(
+        SmartBulb,
+        "set_light_state",
+        autospec=True,
+        side_effect=lambda bulb, state: {"host": bulb.host},
+    ):
+        results = SmartBulb.bulk_set_state(bulbs, {"on_off": 1})
+    assert results == [{"host": bulb.host} for bulb in bulbs]
+
+
+@bulb
+def test_bulk_set_state_error(dev):
+    broken = SmartBulb(
+        "127.0.0.2", protocol=Mock(query=Mock(side_effect=OSError)), cache_ttl=0
+    )
+
+    with pytest.raises(SmartDeviceException):
+        SmartBulb.bulk_set_state([dev, broken], {"on_off": 1})
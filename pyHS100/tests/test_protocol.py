@@ -1,6 +1,12 @@
 from unittest import TestCase
 from ..protocol import TPLinkSmartHomeProtocol
+import asyncio
 import json
+import socket
+import struct
+import threading
+import time
+from unittest.mock import patch
 
 
 class TestTPLinkSmartHomeProtocol(TestCase):
@@ -70,3 +76,154 @@ class TestTPLinkSmartHomeProtocol(TestCase):
         d = "{'snowman': '\u2603'}"
 
         self.assertEqual(d, TPLinkSmartHomeProtocol.decrypt(e))
+
+
+class FakeDeviceServer:
+    """Minimal device answering every request on a connection with itself."""
+
+    def __init__(self, close_after_response=False, delay=0):
+        self.close_after_response = close_after_response
+        self.delay = delay
+        self.connections = 0
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(5)
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            with conn:
+                while True:
+                    header = conn.recv(4)
+                    if not header:
+                        break
+                    length = struct.unpack(">I", header)[0]
+                    data = b""
+                    while len(data) < length:
+                        data += conn.recv(length - len(data))
+                    time.sleep(self.delay)
+                    conn.sendall(header + data)
+                    if self.close_after_response:
+                        break
+
+    def close(self):
+        self.sock.close()
+
+
+class TestTPLinkSmartHomeProtocolConnection(TestCase):
+    def setUp(self):
+        self.protocol = TPLinkSmartHomeProtocol()
+
+    def tearDown(self):
+        TPLinkSmartHomeProtocol.close()
+
+    def test_connection_reused(self):
+        server = FakeDeviceServer()
+        try:
+            for i in range(3):
+                res = self.protocol.query("127.0.0.1", {"i": i}, port=server.port)
+                self.assertEqual({"i": i}, res)
+            self.assertEqual(1, server.connections)
+        finally:
+            server.close()
+
+    def test_reconnect_when_closed_by_device(self):
+        server = FakeDeviceServer(close_after_response=True)
+        try:
+            for i in range(3):
+                res = self.protocol.query("127.0.0.1", {"i": i}, port=server.port)
+                self.assertEqual({"i": i}, res)
+            self.assertEqual(3, server.connections)
+        finally:
+            server.close()
+
+    def test_idle_connection_closed(self):
+        server = FakeDeviceServer()
+        try:
+            self.protocol.query("127.0.0.1", {"foo": 1}, port=server.port)
+            threads = threading.active_count()
+
+            idle = time.monotonic() + TPLinkSmartHomeProtocol.IDLE_TIMEOUT + 1
+            with patch("pyHS100.protocol.time.monotonic", return_value=idle):
+                self.protocol.query("127.0.0.1", {"foo": 1}, port=server.port)
+
+            self.assertEqual(2, server.connections)
+            self.assertEqual(threads, threading.active_count())
+        finally:
+            server.close()
+
+    def test_close(self):
+        server = FakeDeviceServer()
+        try:
+            self.protocol.query("127.0.0.1", {"foo": 1}, port=server.port)
+            self.protocol.close()
+            self.protocol.query("127.0.0.1", {"foo": 1}, port=server.port)
+            self.assertEqual(2, server.connections)
+        finally:
+            server.close()
+
+    def test_close_host(self):
+        server = FakeDeviceServer()
+        other = FakeDeviceServer()
+        try:
+            self.protocol.query("127.0.0.1", {"foo": 1}, port=server.port)
+            self.protocol.query("127.0.0.1", {"foo": 1}, port=other.port)
+            self.protocol.close("127.0.0.1", port=server.port)
+            self.protocol.query("127.0.0.1", {"foo": 1}, port=server.port)
+            self.protocol.query("127.0.0.1", {"foo": 1}, port=other.port)
+            self.assertEqual(2, server.connections)
+            self.assertEqual(1, other.connections)
+        finally:
+            server.close()
+            other.close()
+
+    def test_connection_shared_between_instances(self):
+        server = FakeDeviceServer()
+        try:
+            TPLinkSmartHomeProtocol.query("127.0.0.1", {"foo": 1}, port=server.port)
+            self.protocol.query("127.0.0.1", {"foo": 1}, port=server.port)
+            self.assertEqual(1, server.connections)
+        finally:
+            server.close()
+
+    def test_queries_to_different_devices_run_concurrently(self):
+        servers = [FakeDeviceServer(delay=0.5) for _ in range(2)]
+        threads = [
+            threading.Thread(
+                target=self.protocol.query,
+                args=("127.0.0.1", {"foo": 1}),
+                kwargs={"port": server.port},
+            )
+            for server in servers
+        ]
+        try:
+            start = time.monotonic()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertLess(time.monotonic() - start, 0.9)
+        finally:
+            for server in servers:
+                server.close()
+
+    def test_async_query(self):
+        for close_after_response in (False, True):
+            server = FakeDeviceServer(close_after_response=close_after_response)
+            loop = asyncio.new_event_loop()
+            try:
+                res = loop.run_until_complete(
+                    TPLinkSmartHomeProtocol.async_query(
+                        "127.0.0.1", {"foo": 1}, port=server.port
+                    )
+                )
+                self.assertEqual({"foo": 1}, res)
+            finally:
+                loop.close()
+                server.close()